@@ -14,11 +14,18 @@ Usage:
 """
 
 import argparse
+import io
 import os
+import re
 import sys
-import tempfile
 import zipfile
-import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+try:
+    from lxml import etree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
 
 # XML namespaces used in PPTX files
 NS = {
@@ -27,6 +34,21 @@ NS = {
     'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
 }
 
+# Fully-qualified tags, built once so lookups skip namespace-prefix expansion
+_A = '{%s}' % NS['a']
+_P = '{%s}' % NS['p']
+
+P_SP = _P + 'sp'
+P_TXBODY = _P + 'txBody'
+A_P = _A + 'p'
+A_PPR = _A + 'pPr'
+A_R = _A + 'r'
+A_RPR = _A + 'rPr'
+A_T = _A + 't'
+A_SOLIDFILL = _A + 'solidFill'
+A_HIGHLIGHT = _A + 'highlight'
+A_SRGBCLR = _A + 'srgbClr'
+
 # Map RGB hex values to color names
 # Using approximate matching for common colors
 # Note: BLACK and WHITE are excluded as they're typically default text/background
@@ -48,53 +70,98 @@ COLOR_MAP = {
 }
 
 
+# Integer-keyed views of the tables above, built once at import
+_COLOR_MAP_INT = {int(k, 16): v for k, v in COLOR_MAP.items()}
+_SKIP_COLORS = {0x000000, 0x000001, 0xFFFFFF, 0xFEFEFE}
+_HEX6_RE = re.compile(r'[0-9A-Fa-f]{6}')
+
+# Annotation prefixes and sentence punctuation, used when guessing
+# whether a line is a title
+_ANNOT_RE = re.compile(r'\[(?:RED:|BLUE:|GREEN:|YELLOW:|@)')
+_PUNCT = frozenset('.!?')
+
+# Slide XML members inside the PPTX archive
+_SLIDE_PATH_RE = re.compile(r'ppt/slides/slide(\d+)\.xml')
+
+# Decks with fewer slides are converted without a process pool
+MIN_PARALLEL_SLIDES = 4
+
+# Placed between slides in the combined Markdown output
+SLIDE_SEPARATOR = '\n\n---\n\n'
+
+
+def _classify_rgb(r, g, b):
+    """
+    Classify an RGB triple by its dominant channel, None if unsaturated.
+    """
+    # High saturation colors only
+    max_c = max(r, g, b)
+    min_c = min(r, g, b)
+
+    if max_c - min_c < 50:  # Low saturation = gray/black/white
+        return None
+
+    if r > 200 and g < 100 and b < 100:
+        return 'RED'
+    if g > 200 and r < 100 and b < 100:
+        return 'GREEN'
+    if b > 200 and r < 100 and g < 100:
+        return 'BLUE'
+    if r > 200 and g > 200 and b < 100:
+        return 'YELLOW'
+    if r > 200 and g > 100 and b < 100:
+        return 'ORANGE'
+    if r > 200 and b > 200 and g < 100:
+        return 'MAGENTA'
+    if b > 200 and g > 200 and r < 100:
+        return 'CYAN'
+
+    return None
+
+
+@lru_cache(maxsize=1024)
 def rgb_to_color_name(hex_val):
     """
     Convert RGB hex value to color name.
     Returns None for black (default text color) or unrecognized colors.
     """
-    hex_val = hex_val.upper()
+    if not _HEX6_RE.fullmatch(hex_val):
+        # Non-standard value: classify from its leading byte pairs only
+        try:
+            return _classify_rgb(int(hex_val[0:2], 16),
+                                 int(hex_val[2:4], 16),
+                                 int(hex_val[4:6], 16))
+        except ValueError:
+            return None
+
+    v = int(hex_val, 16)
 
     # Direct match
-    if hex_val in COLOR_MAP:
-        return COLOR_MAP[hex_val]
+    name = _COLOR_MAP_INT.get(v)
+    if name is not None:
+        return name
 
     # Skip black/white (usually default text/background)
-    if hex_val in ('000000', '000001', 'FFFFFF', 'FEFEFE'):
+    if v in _SKIP_COLORS:
         return None
 
     # Try to classify by dominant channel
-    try:
-        r = int(hex_val[0:2], 16)
-        g = int(hex_val[2:4], 16)
-        b = int(hex_val[4:6], 16)
+    return _classify_rgb((v >> 16) & 0xFF, (v >> 8) & 0xFF, v & 0xFF)
 
-        # High saturation colors only
-        max_c = max(r, g, b)
-        min_c = min(r, g, b)
 
-        if max_c - min_c < 50:  # Low saturation = gray/black/white
-            return None
+@lru_cache(maxsize=4096)
+def _compute_formatting(key):
+    """
+    Resolve a (b, i, fill_hex, highlight_hex) key into formatting flags.
+    Cached since runs in a deck share a small set of styles.
+    """
+    b, i, fill_hex, highlight_hex = key
 
-        if r > 200 and g < 100 and b < 100:
-            return 'RED'
-        if g > 200 and r < 100 and b < 100:
-            return 'GREEN'
-        if b > 200 and r < 100 and g < 100:
-            return 'BLUE'
-        if r > 200 and g > 200 and b < 100:
-            return 'YELLOW'
-        if r > 200 and g > 100 and b < 100:
-            return 'ORANGE'
-        if r > 200 and b > 200 and g < 100:
-            return 'MAGENTA'
-        if b > 200 and g > 200 and r < 100:
-            return 'CYAN'
-
-    except (ValueError, IndexError):
-        pass
+    # Text color from solidFill, highlight/background color
+    text_color = rgb_to_color_name(fill_hex) if fill_hex is not None else None
+    highlight_color = rgb_to_color_name(highlight_hex) if highlight_hex is not None else None
 
-    return None
+    return b == '1', i == '1', text_color, highlight_color
 
 
 def extract_run_formatting(rPr):
@@ -107,27 +174,21 @@ def extract_run_formatting(rPr):
     if rPr is None:
         return False, False, None, None
 
-    is_bold = rPr.get('b') == '1'
-    is_italic = rPr.get('i') == '1'
-
-    text_color = None
-    highlight_color = None
-
-    # Text color from solidFill
-    solidFill = rPr.find('a:solidFill', NS)
-    if solidFill is not None:
-        srgbClr = solidFill.find('a:srgbClr', NS)
-        if srgbClr is not None:
-            text_color = rgb_to_color_name(srgbClr.get('val', ''))
-
-    # Highlight/background color
-    highlight = rPr.find('a:highlight', NS)
-    if highlight is not None:
-        srgbClr = highlight.find('a:srgbClr', NS)
-        if srgbClr is not None:
-            highlight_color = rgb_to_color_name(srgbClr.get('val', ''))
+    # Single pass over the run properties for the fill and highlight colors
+    fill_hex = None
+    highlight_hex = None
+    for child in rPr:
+        tag = child.tag
+        if tag == A_SOLIDFILL:
+            srgbClr = child.find(A_SRGBCLR)
+            if srgbClr is not None:
+                fill_hex = srgbClr.get('val', '')
+        elif tag == A_HIGHLIGHT:
+            srgbClr = child.find(A_SRGBCLR)
+            if srgbClr is not None:
+                highlight_hex = srgbClr.get('val', '')
 
-    return is_bold, is_italic, text_color, highlight_color
+    return _compute_formatting((rPr.get('b'), rPr.get('i'), fill_hex, highlight_hex))
 
 
 def format_text_with_annotations(text, is_bold, is_italic, text_color, highlight_color):
@@ -137,6 +198,10 @@ def format_text_with_annotations(text, is_bold, is_italic, text_color, highlight
     if not text:
         return text
 
+    # Most runs carry no formatting at all
+    if not (is_bold or is_italic or text_color or highlight_color):
+        return text
+
     result = text
 
     # Apply bold/italic (innermost)
@@ -158,60 +223,77 @@ def format_text_with_annotations(text, is_bold, is_italic, text_color, highlight
     return result
 
 
+def _release(elem):
+    """
+    Free an element that has been fully processed during iterparse.
+    With lxml, already-processed preceding siblings are dropped as well.
+    """
+    elem.clear()
+    if hasattr(elem, 'getprevious'):
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+
 def extract_slide_content(slide_path):
     """
     Extract text from a single slide preserving bullet point structure and formatting.
 
+    The slide XML is streamed with iterparse and each paragraph is released
+    as soon as it has been processed, so memory stays O(one paragraph).
+
     Args:
-        slide_path: Path to slide XML file
+        slide_path: Path to slide XML file (or a binary file object)
 
-    Returns:
-        List of (level, text) tuples where level indicates indentation
+    Yields:
+        (level, text) tuples where level indicates indentation
     """
-    tree = ET.parse(slide_path)
-    root = tree.getroot()
-
-    content = []
-
-    # Find all shape elements (text boxes, titles, etc.)
-    for sp in root.findall('.//p:sp', NS):
-        txBody = sp.find('.//p:txBody', NS)
-        if txBody is None:
+    depth = 0
+    open_shapes = 0     # Number of currently open p:sp elements
+    body_depth = None   # Depth of the p:txBody of the current shape
+
+    for event, elem in ET.iterparse(slide_path, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if elem.tag == P_SP:
+                open_shapes += 1
+            elif elem.tag == P_TXBODY and open_shapes and body_depth is None:
+                body_depth = depth
             continue
 
-        for para in txBody.findall('a:p', NS):
-            # Get paragraph properties for indentation level
-            pPr = para.find('a:pPr', NS)
-            level = 0
-            if pPr is not None:
-                level = int(pPr.get('lvl', '0'))
+        tag = elem.tag
+        if tag == A_P and body_depth == depth - 1:
+            para = elem
 
-            # Process each text run with its formatting
+            # Walk the paragraph's children once: paragraph properties give
+            # the indentation level, runs carry the text and its formatting
+            level = 0
             para_text_parts = []
 
-            for run in para.findall('a:r', NS):
-                rPr = run.find('a:rPr', NS)
-                t = run.find('a:t', NS)
-
-                if t is not None and t.text:
-                    is_bold, is_italic, text_color, highlight_color = extract_run_formatting(rPr)
-                    formatted = format_text_with_annotations(
-                        t.text, is_bold, is_italic, text_color, highlight_color
-                    )
-                    para_text_parts.append(formatted)
+            for child in para:
+                if child.tag == A_R:
+                    rPr = child.find(A_RPR)
+                    t = child.find(A_T)
 
-            # Also check for direct text elements (not in runs)
-            for t in para.findall('a:t', NS):
-                # Skip if this t is inside an a:r (already processed)
-                parent = t.getparent() if hasattr(t, 'getparent') else None
-                # ElementTree doesn't have getparent, so we check differently
-                pass  # Already handled by finding direct children
+                    if t is not None and t.text:
+                        is_bold, is_italic, text_color, highlight_color = extract_run_formatting(rPr)
+                        formatted = format_text_with_annotations(
+                            t.text, is_bold, is_italic, text_color, highlight_color
+                        )
+                        para_text_parts.append(formatted)
+                elif child.tag == A_PPR:
+                    level = int(child.get('lvl', '0'))
 
             text = ''.join(para_text_parts).strip()
+            _release(para)
             if text:
-                content.append((level, text))
+                yield level, text
+        elif tag == P_TXBODY and depth == body_depth:
+            body_depth = None
+        elif tag == P_SP:
+            open_shapes -= 1
+            _release(elem)
 
-    return content
+        depth -= 1
 
 
 def format_slide_as_markdown(slide_num, content):
@@ -225,37 +307,69 @@ def format_slide_as_markdown(slide_num, content):
     Returns:
         Markdown formatted string
     """
-    lines = [f"# Slide {slide_num}"]
+    # Every fragment carries its own leading newline(s) so the result is
+    # built with a single join
+    parts = [f"# Slide {slide_num}"]
 
     for level, text in content:
         if level == 0:
             # Top-level items: could be title or main bullet
-            # Short items are likely titles (unless they have formatting annotations)
-            is_title = len(text) < 60 and not any(c in text for c in '.!?')
-            # But if it has color annotations, might be longer
-            plain_text = text
-            for prefix in ['[RED:', '[BLUE:', '[GREEN:', '[YELLOW:', '[@']:
-                plain_text = plain_text.replace(prefix, '')
-            is_title = len(plain_text) < 80 and not any(c in plain_text for c in '.!?')
+            # Short items are likely titles; annotation prefixes don't count
+            # towards the length
+            plain_text = _ANNOT_RE.sub('', text)
+            is_title = len(plain_text) < 80 and _PUNCT.isdisjoint(plain_text)
 
             if is_title:
-                lines.append(f"\n## {text}")
+                parts.append(f"\n\n## {text}")
             else:
-                lines.append(f"\n{text}")
+                parts.append(f"\n\n{text}")
         else:
             # Indented bullet points
             indent = '  ' * (level - 1)
-            lines.append(f"{indent}- {text}")
+            parts.append(f"\n{indent}- {text}")
 
-    return '\n'.join(lines)
+    return ''.join(parts)
 
 
-def extract_pptx(pptx_path):
+def _join_slides(slides):
+    """
+    Yield slide Markdown strings with separators pre-inserted, for ''.join.
+    """
+    separator = ''
+    for markdown in slides:
+        yield separator
+        yield markdown
+        separator = SLIDE_SEPARATOR
+
+
+def _process_slide(task):
+    """
+    Convert one slide to Markdown (runs in a worker process).
+
+    Args:
+        task: (slide_num, xml_bytes) tuple
+
+    Returns:
+        Markdown formatted string, or None if the slide has no text
+    """
+    slide_num, data = task
+    content = list(extract_slide_content(io.BytesIO(data)))
+    if not content:
+        return None
+    return format_slide_as_markdown(slide_num, content)
+
+
+def extract_pptx(pptx_path, jobs=1):
     """
     Extract all slides from PPTX file to Markdown.
 
+    Slides are independent and can be converted across worker processes
+    with jobs > 1. Conversion is serial by default: a slide takes well
+    under a millisecond, so pool startup dominates for typical decks.
+
     Args:
         pptx_path: Path to PPTX file
+        jobs: Number of worker processes (default: 1 = serial)
 
     Returns:
         Markdown formatted string with all slides
@@ -263,34 +377,42 @@ def extract_pptx(pptx_path):
     if not os.path.exists(pptx_path):
         raise FileNotFoundError(f"File not found: {pptx_path}")
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        # Extract PPTX (it's a ZIP archive)
-        with zipfile.ZipFile(pptx_path, 'r') as z:
-            z.extractall(tmpdir)
+    # PPTX is a ZIP archive; slide XML is read straight out of it
+    with zipfile.ZipFile(pptx_path, 'r') as z:
+        # Get all slide files sorted by number
+        slide_files = []
+        for name in z.namelist():
+            m = _SLIDE_PATH_RE.fullmatch(name)
+            if m:
+                slide_files.append((int(m.group(1)), m.group(1), name))
+        if not slide_files:
+            raise ValueError(f"Invalid PPTX file: no slides found")
+        slide_files.sort()
 
-        slides_dir = os.path.join(tmpdir, 'ppt', 'slides')
-        if not os.path.exists(slides_dir):
-            raise ValueError(f"Invalid PPTX file: no slides directory found")
+        # ZipFile is not shared with workers, read raw XML up front
+        tasks = [(slide_num, z.read(name)) for _, slide_num, name in slide_files]
 
-        # Get all slide files sorted by number
-        slide_files = [
-            f for f in os.listdir(slides_dir)
-            if f.startswith('slide') and f.endswith('.xml')
-        ]
-        slide_files.sort(key=lambda x: int(x.replace('slide', '').replace('.xml', '')))
+    # Process each slide; pool startup isn't worth it for tiny decks
+    if jobs <= 1 or len(tasks) < MIN_PARALLEL_SLIDES:
+        results = map(_process_slide, tasks)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            results = list(ex.map(_process_slide, tasks, chunksize=4))
 
-        # Process each slide
-        all_slides = []
-        for slide_file in slide_files:
-            slide_num = slide_file.replace('slide', '').replace('.xml', '')
-            slide_path = os.path.join(slides_dir, slide_file)
+    return ''.join(_join_slides(md for md in results if md is not None))
 
-            content = extract_slide_content(slide_path)
-            if content:
-                markdown = format_slide_as_markdown(slide_num, content)
-                all_slides.append(markdown)
 
-        return '\n\n---\n\n'.join(all_slides)
+def _positive_int(value):
+    """
+    argparse type for --jobs: an integer >= 1.
+    """
+    try:
+        n = int(value)
+    except ValueError:
+        n = 0
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer: {value!r}")
+    return n
 
 
 def main():
@@ -299,11 +421,13 @@ def main():
     )
     parser.add_argument('pptx_file', help='Path to PPTX file')
     parser.add_argument('-o', '--output', help='Output file (default: stdout)')
+    parser.add_argument('-j', '--jobs', type=_positive_int, default=1,
+                        help='Worker processes for slide conversion (default: 1, serial)')
 
     args = parser.parse_args()
 
     try:
-        markdown = extract_pptx(args.pptx_file)
+        markdown = extract_pptx(args.pptx_file, jobs=args.jobs)
 
         if args.output:
             with open(args.output, 'w', encoding='utf-8') as f:
@@ -8,74 +8,220 @@ The firmware generates CSV lines:
 Each boot generates a random run_id, makes 100 measurements, then reboots.
 """
 
+import mmap
+import os
+import re
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+import matplotlib
 from pathlib import Path
 
+# Batch (non-interactive) analysis: render with Agg and skip plt.show().
+# Enabled by MAC_TIMER_ALIGN_HEADLESS set to anything but '' or '0'
+HEADLESS = os.environ.get('MAC_TIMER_ALIGN_HEADLESS') not in (None, '', '0')
+if HEADLESS:
+    matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+
+# MAC timer runs at 40 MHz
+US_PER_TICK = 1.0 / 40.0
+NS_PER_TICK = 25.0
+
+COLUMNS = ['run_id', 'offset_ticks', 'offset_ticks_min', 'offset_ticks_max']
+
+# Data line: MAC_TIMER_ALIGN,run_id,offset_ticks,offset_ticks_min,offset_ticks_max
+# Lines end in \n, \r\n or a lone \r; surrounding blanks and signs are allowed.
+# The pattern starts with the literal tag so the regex engine can skip ahead
+# to candidates quickly; leading blanks are checked by _at_line_start()
+_FIELD = rb'[^\S\r\n]*([+-]?\d+)[^\S\r\n]*'
+MAC_TIMER_ALIGN_RE = re.compile(
+    rb'MAC_TIMER_ALIGN,' + rb','.join([_FIELD] * 4) + rb'(?=\r|$)', re.MULTILINE)
+_NON_ASCII_RE = re.compile(rb'[\x80-\xff]')
+_BLANKS = b' \t\f\v'
+_LINE_BREAKS = b'\r\n'
+
+
+def _at_line_start(data, pos):
+    """
+    True if only blanks separate pos from the start of its line.
+    """
+    while pos > 0:
+        c = data[pos - 1]
+        if c in _LINE_BREAKS:
+            return True
+        if c not in _BLANKS:
+            return False
+        pos -= 1
+    return True
+
 
 def load_mac_timer_align_log(log_path, drop_incomplete_last_run=True):
     """
     Load MAC_TIMER_ALIGN data from log file.
 
+    Accepts the same lines as a text-mode read with errors='ignore': \n,
+    \r\n or lone \r line endings, bytes that aren't valid UTF-8 are
+    dropped, and fields may carry blanks and a +/- sign. Fields must
+    otherwise be plain decimal integers (no '_' separators).
+
     Args:
         log_path: Path to idf.py stdout log file
         drop_incomplete_last_run: If True, drop the last run if it has < 100 samples
 
     Returns:
-        DataFrame with columns: run_id, offset_ticks, offset_ticks_min, offset_ticks_max
+        DataFrame with columns: run_id, offset_ticks, offset_ticks_min, offset_ticks_max,
+        plus derived range_ticks, offset_us, range_ns
     """
     log_path = Path(log_path)
     if not log_path.exists():
         raise FileNotFoundError(f"Log file not found: {log_path}")
 
-    data = []
-    with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
-        for line in f:
-            line = line.strip()
-            # Skip header line
-            if line.startswith('MAC_TIMER_ALIGN,run,'):
-                continue
-            if line.startswith('MAC_TIMER_ALIGN,'):
-                parts = line.split(',')
-                if len(parts) == 5:
-                    try:
-                        data.append({
-                            'run_id': int(parts[1]),
-                            'offset_ticks': int(parts[2]),
-                            'offset_ticks_min': int(parts[3]),
-                            'offset_ticks_max': int(parts[4])
-                        })
-                    except ValueError:
-                        continue  # Skip malformed lines
-
-    df = pd.DataFrame(data)
-    if df.empty:
-        return df
+    # One regex scan over the memory-mapped log instead of a Python loop per
+    # line; the header line and malformed lines simply don't match
+    matches = []
+    with open(log_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size > 0:  # mmap rejects empty files
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                data = mm
+                if _NON_ASCII_RE.search(mm):
+                    # Drop undecodable bytes (e.g. serial noise around
+                    # reboots) like the old errors='ignore' text read did
+                    data = mm[:].decode('utf-8', 'ignore').encode('utf-8')
+                matches = [m.groups() for m in MAC_TIMER_ALIGN_RE.finditer(data)
+                           if _at_line_start(data, m.start())]
+
+    try:
+        arr = np.array(matches, dtype=np.int64)
+    except OverflowError:
+        # A corrupted line has a field outside int64: skip such lines only
+        int64 = np.iinfo(np.int64)
+        matches = [m for m in matches
+                   if all(int64.min <= int(v) <= int64.max for v in m)]
+        arr = np.array(matches, dtype=np.int64)
+    arr = arr.reshape(-1, len(COLUMNS))
 
     # Drop incomplete last run (test was interrupted)
-    if drop_incomplete_last_run and len(df) > 0:
-        # Get the run_id from the last row (chronologically last run)
-        last_run_id = df.iloc[-1]['run_id']
-        last_run_count = (df['run_id'] == last_run_id).sum()
+    if drop_incomplete_last_run and len(arr) > 0:
+        # Get the run_id from the last row (chronologically last run); its
+        # samples are the trailing rows, so count them from the tail and
+        # keep a positional slice instead of filtering with a boolean mask
+        run_ids = arr[:, 0]
+        last_run_id = run_ids[-1]
+        differs = run_ids[::-1] != last_run_id
+        last_run_count = int(np.argmax(differs)) if differs.any() else len(run_ids)
         if last_run_count < 100:
-            df = df[df['run_id'] != last_run_id]
+            arr = arr[:len(arr) - last_run_count]
             print(f"  (Dropped incomplete last run {last_run_id} with {last_run_count} samples)")
 
-    if not df.empty:
-        df['range_ticks'] = df['offset_ticks_max'] - df['offset_ticks_min']
-        df['offset_us'] = df['offset_ticks'] / 40.0
-        df['range_ns'] = df['range_ticks'] * 25.0  # 25ns per tick
-    return df
+    # Derived columns are computed on the ndarray and handed to pandas as-is;
+    # an empty log yields an empty frame with the same columns
+    range_ticks = arr[:, 3] - arr[:, 2]
+    columns = {name: arr[:, i] for i, name in enumerate(COLUMNS)}
+    columns['range_ticks'] = range_ticks
+    columns['offset_us'] = arr[:, 1] * US_PER_TICK
+    columns['range_ns'] = range_ticks * NS_PER_TICK
+    return pd.DataFrame(columns, copy=False)
+
+
+def per_run_stats(df):
+    """
+    Compute per-run offset spread without groupby().agg().
+
+    Rows are stably sorted by run_id so each run is a contiguous segment
+    (in file order); segment boundaries then give the last sample and the
+    number of distinct offsets of every run.
+
+    Args:
+        df: DataFrame from load_mac_timer_align_log
+
+    Returns:
+        DataFrame with columns: run_id, unique_offsets, final_range
+        (one row per run, ordered by run_id)
+    """
+    n = len(df)
+    if n == 0:
+        return pd.DataFrame({
+            'run_id': np.empty(0, dtype=np.int64),
+            'unique_offsets': np.empty(0, dtype=np.int64),
+            'final_range': np.empty(0, dtype=np.int64),
+        })
+
+    run_ids = df['run_id'].values
+    offsets = df['offset_ticks'].values
+
+    # Final converged range = last sample of each run
+    order = np.argsort(run_ids, kind='stable')
+    sorted_ids = run_ids[order]
+    starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+    last_idx = np.r_[starts[1:], n] - 1
+    final_range = df['range_ticks'].values[order][last_idx]
+
+    # Unique offsets = value changes within each run, sorted by (run_id, offset)
+    order = np.lexsort((offsets, run_ids))
+    sorted_offsets = offsets[order]
+    is_new = np.r_[True, (sorted_ids[1:] != sorted_ids[:-1]) |
+                   (sorted_offsets[1:] != sorted_offsets[:-1])]
+    unique_offsets = np.add.reduceat(is_new.astype(np.int64), starts)
+
+    return pd.DataFrame({
+        'run_id': sorted_ids[starts],
+        'unique_offsets': unique_offsets,
+        'final_range': final_range,
+    })
+
+
+def _plot_hist(ax, values, bins):
+    """
+    Draw a histogram from one np.histogram pass (bypasses pandas .hist()).
+    """
+    counts, edges = np.histogram(values, bins=bins)
+    ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge', edgecolor='black')
+    ax.grid(True)
+
+
+def _get_figure(fig=None):
+    """
+    Return (fig, axes) with a cleared 2x2 subplot grid.
+
+    A figure passed in by the caller is reused (its axes are cleared) only
+    while pyplot still has it open; a figure that plt.show() or the inline
+    backend has already closed would be redrawn but never displayed, so a
+    new figure is created instead. Without fig, a new figure is created,
+    so earlier results keep their plots.
+
+    In HEADLESS mode nothing is displayed, so any passed figure is reused,
+    and new figures are plain Figure objects not registered with pyplot:
+    they are freed together with the result instead of accumulating as
+    open pyplot figures across a batch.
+    """
+    if HEADLESS:
+        if fig is None:
+            fig = Figure(figsize=(12, 10))
+    elif fig is None or not plt.fignum_exists(getattr(fig, 'number', None)):
+        fig = plt.figure(figsize=(12, 10))
+
+    if len(fig.axes) == 4:
+        axes = np.array(fig.axes).reshape(2, 2)
+        for ax in axes.flat:
+            ax.cla()
+    else:
+        fig.clf()
+        axes = fig.subplots(2, 2)
+    return fig, axes
 
 
-def analyze_chip(log_path, chip_name="Chip"):
+def analyze_chip(log_path, chip_name="Chip", fig=None):
     """
     Analyze MAC timer alignment data for a single chip.
 
     Args:
         log_path: Path to idf.py stdout log file
         chip_name: Name for display purposes
+        fig: Figure to clear and redraw into, e.g. a previous result['fig'];
+             only reused while it is still open in pyplot (GUI window left
+             open, ipympl/widget backend), otherwise a new figure is made.
+             In HEADLESS mode any passed figure is reused
 
     Returns:
         Dictionary with analysis results
@@ -105,11 +251,7 @@ def analyze_chip(log_path, chip_name="Chip"):
     print(f"  Runs with exactly 100: {(measurements_per_run == 100).sum()} / {num_runs}")
 
     # Offset spread within each run
-    run_stats = df.groupby('run_id').agg({
-        'offset_ticks': ['nunique'],
-        'range_ticks': 'last'  # Final converged range
-    }).reset_index()
-    run_stats.columns = ['run_id', 'unique_offsets', 'final_range']
+    run_stats = per_run_stats(df)
 
     print(f"\n--- Offset convergence within runs ---")
     print(f"  Unique offsets per run:")
@@ -123,13 +265,13 @@ def analyze_chip(log_path, chip_name="Chip"):
     print(f"  Min:  {run_stats['final_range'].min()} ticks ({run_stats['final_range'].min()*25:.0f} ns)")
     print(f"  Max:  {run_stats['final_range'].max()} ticks ({run_stats['final_range'].max()*25:.0f} ns)")
 
-    # Create figure with subplots (2x2 layout)
-    fig, axes = plt.subplots(2, 2, figsize=(12, 10))
+    # Figure with subplots (2x2 layout), reused only if passed in
+    fig, axes = _get_figure(fig)
     fig.suptitle(f'{chip_name} - MAC Timer Alignment Analysis', fontsize=14)
 
     # Plot 1: Measurements per run histogram
     ax1 = axes[0, 0]
-    measurements_per_run.hist(ax=ax1, bins=20, edgecolor='black')
+    _plot_hist(ax1, measurements_per_run.values, bins=20)
     ax1.axvline(x=100, color='r', linestyle='--', label='Target (100)')
     ax1.set_xlabel('Measurements per run')
     ax1.set_ylabel('Count (runs)')
@@ -138,27 +280,28 @@ def analyze_chip(log_path, chip_name="Chip"):
 
     # Plot 2: Unique offsets per run histogram
     ax2 = axes[0, 1]
-    run_stats['unique_offsets'].hist(ax=ax2, bins=20, edgecolor='black')
+    _plot_hist(ax2, run_stats['unique_offsets'].values, bins=20)
     ax2.set_xlabel('Unique offset values')
     ax2.set_ylabel('Count (runs)')
     ax2.set_title('Unique Offsets per Run')
 
     # Plot 3: Final converged range per run histogram
     ax3 = axes[1, 0]
-    run_stats['final_range'].hist(ax=ax3, bins=30, edgecolor='black')
+    _plot_hist(ax3, run_stats['final_range'].values, bins=30)
     ax3.set_xlabel('Final range (ticks)')
     ax3.set_ylabel('Count (runs)')
     ax3.set_title('Final Converged Range per Run')
 
     # Plot 4: All sample ranges histogram
     ax4 = axes[1, 1]
-    df['range_ticks'].hist(ax=ax4, bins=50, edgecolor='black')
+    _plot_hist(ax4, df['range_ticks'].values, bins=50)
     ax4.set_xlabel('Range (ticks)')
     ax4.set_ylabel('Count (samples)')
     ax4.set_title('Sample Range Distribution (all samples)')
 
-    plt.tight_layout()
-    plt.show()
+    fig.tight_layout()
+    if not HEADLESS:
+        plt.show()
 
     return {
         'chip_name': chip_name,
@@ -166,5 +309,6 @@ def analyze_chip(log_path, chip_name="Chip"):
         'num_runs': num_runs,
         'measurements_per_run': measurements_per_run,
         'run_stats': run_stats,
-        'df': df
+        'df': df,
+        'fig': fig
     }